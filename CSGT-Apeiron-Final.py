@@ -3,6 +3,8 @@ from scipy.integrate import quad
 from scipy.optimize import minimize
 import matplotlib.pyplot as plt
 
+from multiprobe import CompositeLikelihood, SNProbe, BAOProbe
+
 # 宇宙論パラメータ (固定)
 Omega_m = 0.3
 Omega_DE = 0.7
@@ -55,22 +57,15 @@ def mu_theory(z, params, M_offset=-19.3):  # Mオフセット調整 (近似)
     return 5 * np.log10(dL_z(z, params) * 1e6 / 10) + M_offset  # pc → Mpc調整
 
 # χ²関数 (SN + BAO)
+# 背景 H(z), dL(z) は 1 回だけ計算し、SN と BAO で共有する
+likelihood = CompositeLikelihood(
+    [SNProbe(sn_data[:,0], sn_data[:,1], sn_data[:,2], marginalize_M=False),
+     BAOProbe(bao_data[:,0], bao_data[:,1], ['H'] * len(bao_data), np.diag(bao_data[:,2]**2))],
+    param_names=['A', 'sigma'],
+    fixed={'H0': H0, 'Om': Omega_m, 'Or': 0.0, 'z_peak': 0.7, 'w_off': -1.0, 'M': -19.3})
+
 def chi2(params):
-    A, sigma = params
-    
-    # SN Ia χ²
-    chi2_sn = 0
-    for z, mu_obs, sigma_mu in sn_data:
-        mu_th = mu_theory(z, params)
-        chi2_sn += ((mu_obs - mu_th)**2 / sigma_mu**2)
-    
-    # BAO χ² (H(z))
-    chi2_bao = 0
-    for z, H_obs, sigma_H in bao_data:
-        H_th = H_z(z, params)
-        chi2_bao += ((H_obs - H_th)**2 / sigma_H**2)
-    
-    return chi2_sn + chi2_bao
+    return likelihood(params)
 
 # 最適化
 initial_guess = [0.0833, 1.0]
@@ -80,6 +75,7 @@ A_opt, sigma_opt = result.x
 chi2_min = result.fun
 
 print(f"最適 A: {A_opt:.4f}, σ: {sigma_opt:.4f}, χ²_min: {chi2_min:.2f}")
+print("内訳: " + ", ".join(f"{k}={v:.2f}" for k, v in likelihood.breakdown(result.x).items()))
 
 # z=0.7ピークの収まり評価 (近傍BAOデータで例: z=0.706の点)
 z_eval = 0.706  # 近いBAO点
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.integrate import quad
+from scipy.interpolate import interp1d
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PANTHEON_FILE = os.path.join(HERE, 'Pantheon+SH0ES.dat')
+
+# =========================
+# データ読み込み（Pantheon+）
+# =========================
+def load_pantheon(path=PANTHEON_FILE, verbose=True):
+    try:
+        sn_df = pd.read_csv(path, sep=r'\s+', comment='#', header=None,
+                            usecols=[1, 2, 10, 11], names=['idsurvey', 'z', 'mu_obs', 'sigma_mu'], engine='python')
+        sn_df = sn_df.apply(pd.to_numeric, errors='coerce').dropna().sort_values('z').reset_index(drop=True)
+        sn_df['idsurvey'] = sn_df['idsurvey'].astype(int)
+        if verbose:
+            print(f"Pantheon+ loaded: {len(sn_df)} points")
+    except Exception:
+        if verbose:
+            print("データ読み込み失敗。ダミー生成")
+        sn_df = pd.DataFrame({'z': np.linspace(0.01, 2.2, 100), 'mu_obs': 30 + 10*np.linspace(0.01, 2.2, 100), 'sigma_mu': 0.1, 'idsurvey': 0})
+    return sn_df
+
+# =========================
+# 理論関数（w_offsetを追加）
+# =========================
+def w_integrand_ext(zp_val, A, sigma, zp_peak, w_off):
+    # 背景の w_off と ガウス型の山 A の統合
+    # 1+w = (1+w_off) + A*exp(...)
+    return ((1.0 + w_off) + A * np.exp(-(zp_val - zp_peak)**2 / (2 * sigma**2))) / (1.0 + zp_val)
+
+def comoving_distance_extended(z_array, A, sigma, zp_peak, Om, w_off):
+    # 無次元の共動距離 χ(z) = ∫dz/E(z)（c/H0 を掛ける前）
+    Ode = 1.0 - Om
+    z_grid = np.linspace(0, 2.5, 120) # 精度をさらに向上
+
+    comoving_grid = []
+    curr_chi = 0
+    for i in range(len(z_grid)):
+        z_curr = z_grid[i]
+        if z_curr == 0:
+            comoving_grid.append(0)
+            continue
+
+        # 3 * ∫ (1+w)/(1+z) dz の計算
+        w_int, _ = quad(w_integrand_ext, 0, z_curr, args=(A, sigma, zp_peak, w_off), epsabs=1e-8)
+        E_z = np.sqrt(Om * (1 + z_curr)**3 + Ode * np.exp(3.0 * w_int))
+
+        if i > 0:
+            dz = z_grid[i] - z_grid[i-1]
+            curr_chi += dz / E_z
+        comoving_grid.append(curr_chi)
+
+    dist_interp = interp1d(z_grid, comoving_grid, kind='cubic')
+    return dist_interp(z_array)
+
+def get_mu_theory_extended(z_array, A, sigma, zp_peak, M, H0, Om, w_off):
+    c = 299792.458
+    chi = comoving_distance_extended(z_array, A, sigma, zp_peak, Om, w_off)
+    dL = (1 + z_array) * chi * (c / H0)
+    return 5.0 * np.log10(dL * 1e6 / 10.0) + M
+
+def unpack_params(params, is_csgt):
+    # [A, sigma, zp_peak, M, H0, Om, w_off] に揃える
+    if is_csgt:
+        A, sigma, zp_peak, M, H0, Om, w_off = params
+    else:
+        M, H0, Om = params
+        A, sigma, zp_peak, w_off = 0.0, 1.0, 0.7, -1.0 # LCDMはw=-1固定
+    return A, sigma, zp_peak, M, H0, Om, w_off
+
+def chi2_final_extended(params, is_csgt, z, mu_obs, sigma_mu):
+    A, sigma, zp_peak, M, H0, Om, w_off = unpack_params(params, is_csgt)
+    try:
+        mu_th = get_mu_theory_extended(z, A, sigma, zp_peak, M, H0, Om, w_off)
+        return np.sum(((mu_obs - mu_th)**2 / sigma_mu**2))
+    except Exception:
+        return 1e18
+
+def get_H_w(z_range, params, is_csgt=True):
+    # プロット・誤差帯用：H(z) と w(z) を格子上でまとめて計算
+    A, sigma, zp, M, H0, Om, w_off = unpack_params(params, is_csgt)
+    z_range = np.asarray(z_range, dtype=float)
+    w_z = w_off + A * np.exp(-(z_range - zp)**2 / (2 * sigma**2))
+    # ∫(1+w_off)/(1+z) は解析的、ガウス部分だけ細かい格子で累積積分
+    z_fine = np.linspace(0, max(z_range.max(), 0.0), 2001)
+    f = A * np.exp(-(z_fine - zp)**2 / (2 * sigma**2)) / (1.0 + z_fine)
+    gauss_int = np.concatenate([[0.0], np.cumsum(0.5 * (f[1:] + f[:-1]) * np.diff(z_fine))])
+    w_int = (1.0 + w_off) * np.log1p(z_range) + np.interp(z_range, z_fine, gauss_int)
+    H_z = H0 * np.sqrt(Om * (1 + z_range)**3 + (1.0 - Om) * np.exp(3.0 * w_int))
+    return w_z, H_z
+
+# =========================
+# 探索範囲
+# =========================
+# [A, sigma, zp_peak, M, H0, Om, w_off]
+bounds_csgt = [
+    (0.01, 0.5),      # A
+    (0.1, 1.5),       # sigma
+    (0.4, 1.2),       # zp_peak
+    (-19.38, -19.32), # M
+    (72.5, 73.5),     # H0 (SH0ESの中心値を狙う)
+    (0.25, 0.35),     # Om
+    (-1.10, -0.90)    # w_off (ここが自由の翼よ)
+]
+
+bounds_lcdm = [
+    (-19.38, -19.32), # M
+    (72.5, 73.5),     # H0
+    (0.25, 0.35)      # Om
+]
+
+PARAM_NAMES = {
+    'csgt': ['A', 'sigma', 'zp_peak', 'M', 'H0', 'Om', 'w_off'],
+    'lcdm': ['M', 'H0', 'Om'],
+}
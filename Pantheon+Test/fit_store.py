@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from scipy.optimize import differential_evolution
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(HERE, 'fit_results')
+
+# =========================
+# キー生成
+# =========================
+def data_hash(*arrays):
+    """Short content hash of the data arrays a fit was run against."""
+    h = hashlib.sha1()
+    for a in arrays:
+        a = np.ascontiguousarray(np.asarray(a, dtype=float))
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+def objective_name(func):
+    # 関数名（呼び出し可能なインスタンスならクラス名）でも区別する
+    name = getattr(func, '__qualname__', None) or type(func).__qualname__
+    return f"{getattr(func, '__module__', None) or type(func).__module__}.{name}"
+
+def fit_key(model, dhash, bounds, seed, objective=None, options=None):
+    spec = {'model': model, 'data': dhash,
+            'bounds': [[float(lo), float(hi)] for lo, hi in bounds], 'seed': seed,
+            'objective': objective, 'options': options or {}}
+    return model + '-' + hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+# 結果を左右する DE の設定（workers/updating は並列化の方法だけなので除外）
+# 省略時も既定値で埋めてからキーにするので、明示した既定値と省略は同じキーになる
+DE_DEFAULTS = {'strategy': 'best1bin', 'maxiter': 1000, 'popsize': 15, 'tol': 0.01,
+               'atol': 0.0, 'mutation': [0.5, 1.0], 'recombination': 0.7, 'polish': True}
+KEYED_DE_OPTIONS = tuple(DE_DEFAULTS)
+
+def de_options(**de_kwargs):
+    """KEYED_DE_OPTIONS with the differential_evolution defaults filled in."""
+    options = {k: de_kwargs.get(k, v) for k, v in DE_DEFAULTS.items()}
+    if np.ndim(options['mutation']):
+        options['mutation'] = [float(m) for m in options['mutation']]
+    return options
+
+# =========================
+# 保存庫本体
+# =========================
+class FitStore:
+    """
+    One JSON (metadata, best fit, timings) + one NPZ (DE population) per fit,
+    both named by fit_key(). status is 'running' while checkpoints are being
+    written and 'done' once the optimizer has returned.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, key):
+        return os.path.join(self.root, key + '.json'), os.path.join(self.root, key + '.npz')
+
+    def __contains__(self, key):
+        return os.path.exists(self._paths(key)[0])
+
+    def keys(self):
+        return sorted(f[:-5] for f in os.listdir(self.root) if f.endswith('.json'))
+
+    def save(self, record, population=None, energies=None):
+        meta_path, pop_path = self._paths(record['key'])
+        if population is not None:
+            tmp = pop_path + '.tmp.npz'
+            np.savez(tmp, population=population, energies=energies)
+            os.replace(tmp, pop_path)
+        meta = {k: v for k, v in record.items() if k not in ('population', 'energies')}
+        tmp = meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, meta_path)
+
+    def load(self, key, with_population=False):
+        meta_path, pop_path = self._paths(key)
+        with open(meta_path) as f:
+            record = json.load(f)
+        if with_population and os.path.exists(pop_path):
+            with np.load(pop_path) as npz:
+                record['population'] = npz['population']
+                record['energies'] = npz['energies']
+        return record
+
+    def records(self, model=None, status='done'):
+        out = []
+        for key in self.keys():
+            try:
+                r = self.load(key)
+            except (OSError, ValueError):
+                continue
+            if model is not None and r['model'] != model:
+                continue
+            if status is not None and r['status'] != status:
+                continue
+            out.append(r)
+        return out
+
+    def latest(self, model):
+        recs = self.records(model)
+        return max(recs, key=lambda r: r['finished']) if recs else None
+
+    def closest(self, model, bounds, dhash=None):
+        """
+        Finished fit of the same model nearest to `bounds` (distance between
+        box centres in units of the new box widths). Same-data fits win ties.
+        """
+        lo, hi = np.array(bounds, dtype=float).T
+        width = np.where(hi > lo, hi - lo, 1.0)
+        best, best_d = None, np.inf
+        for r in self.records(model):
+            b = np.array(r['bounds'], dtype=float)
+            if b.shape != (len(lo), 2):
+                continue
+            d = np.linalg.norm((b.mean(axis=1) - (lo + hi) / 2) / width)
+            d += 0.0 if r['data_hash'] == dhash else 1.0
+            if d < best_d:
+                best, best_d = r, d
+        return best
+
+# =========================
+# 初期集団（ウォームスタート）
+# =========================
+def _seed_population(bounds, x_best=None, population=None, popsize=15, seed=None):
+    lo, hi = np.array(bounds, dtype=float).T
+    n = len(lo)
+    size = max(5, popsize * n)
+    rng = np.random.default_rng(seed)
+    # ラテン超方格で埋めてから前回の集団/最適値を上書き
+    u = (rng.permuted(np.tile(np.arange(size), (n, 1)), axis=1).T + rng.random((size, n))) / size
+    pop = lo + u * (hi - lo)
+    if population is not None and population.shape[1] == n:
+        k = min(size, len(population))
+        pop[:k] = population[:k]
+    if x_best is not None:
+        pop[0] = x_best
+    return np.clip(pop, lo, hi)
+
+# =========================
+# フィット実行（キャッシュ・再開・ウォームスタート）
+# =========================
+def run_fit(func, bounds, model, dhash, args=(), seed=None, store=None,
+            warm_start=True, checkpoint_every=1, verbose=True, **de_kwargs):
+    """
+    differential_evolution wrapped with the results store.
+
+    - an identical fit (model, data, bounds, seed, objective and the DE
+      options in KEYED_DE_OPTIONS, defaults filled in) that already finished
+      is returned from the store without re-running;
+    - a fit interrupted mid-run resumes from its last checkpointed generation;
+    - otherwise the population is seeded from the closest previous fit of the
+      same model (its final population, or at least its best-fit vector).
+
+    Returns the stored record (dict with 'key', 'x', 'fun', ...).
+    """
+    store = store or FitStore()
+    options = de_options(**de_kwargs)
+    maxiter = de_kwargs.pop('maxiter', options['maxiter'])
+    key = fit_key(model, dhash, bounds, seed, objective_name(func), options)
+    popsize = options['popsize']
+
+    init, nit_done, elapsed_done, origin = 'latinhypercube', 0, 0.0, None
+    nfev_done, started = 0, time.time()
+    if key in store:
+        prev = store.load(key, with_population=True)
+        if prev['status'] == 'done':
+            if verbose:
+                print(f"[fit_store] cached: {key} (chi2={prev['fun']:.4f})")
+            return prev
+        if 'population' in prev:
+            init = np.clip(prev['population'], *np.array(bounds, dtype=float).T)
+            nit_done, elapsed_done, origin = prev['nit'], prev['elapsed'], prev['warm_start_from']
+            nfev_done, started = prev['nfev'], prev['started']
+            if verbose:
+                print(f"[fit_store] resuming {key} from generation {nit_done}")
+    elif warm_start:
+        near = store.closest(model, bounds, dhash)
+        if near is not None:
+            near = store.load(near['key'], with_population=True)
+            init = _seed_population(bounds, near['x'], near.get('population'), popsize, seed)
+            origin = near['key']
+            if verbose:
+                print(f"[fit_store] warm start {key} from {origin}")
+
+    record = {
+        'key': key, 'model': model, 'data_hash': dhash,
+        'bounds': [[float(lo), float(hi)] for lo, hi in bounds], 'seed': seed,
+        'objective': objective_name(func), 'options': options,
+        'status': 'running', 'warm_start_from': origin,
+        'x': None, 'fun': None, 'nit': nit_done, 'nfev': nfev_done,
+        'started': started, 'finished': None, 'elapsed': elapsed_done,
+    }
+    t0 = time.perf_counter()
+    gen = [nit_done]
+
+    def checkpoint(intermediate_result):
+        gen[0] += 1
+        if gen[0] % checkpoint_every == 0:
+            record.update(x=intermediate_result.x.tolist(), fun=float(intermediate_result.fun),
+                          nit=gen[0], nfev=nfev_done + int(intermediate_result.nfev),
+                          elapsed=elapsed_done + time.perf_counter() - t0)
+            store.save(record, intermediate_result.population, intermediate_result.population_energies)
+
+    # 再開時は同じ乱数列を繰り返さないよう世代数で種をずらす
+    rng_seed = None if seed is None else np.random.default_rng([seed, nit_done])
+    res = differential_evolution(func, bounds, args=args, seed=rng_seed, init=init,
+                                 maxiter=max(1, maxiter - nit_done), callback=checkpoint, **de_kwargs)
+
+    record.update(status='done', x=res.x.tolist(), fun=float(res.fun),
+                  nit=nit_done + res.nit, nfev=nfev_done + int(res.nfev), message=str(res.message),
+                  finished=time.time(), elapsed=elapsed_done + time.perf_counter() - t0)
+    store.save(record, res.population, res.population_energies)
+    if verbose:
+        print(f"[fit_store] saved {key}: chi2={res.fun:.4f}, {record['elapsed']:.1f}s")
+    return record
@@ -0,0 +1,153 @@
+import os
+import time
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+from scipy.optimize import minimize
+
+from csgt_model import load_pantheon, chi2_final_extended, get_H_w, bounds_csgt, bounds_lcdm, PARAM_NAMES
+from fit_store import FitStore, data_hash
+
+MODELS = {'csgt': (True, bounds_csgt), 'lcdm': (False, bounds_lcdm)}
+
+# =========================
+# 共有メモリ上の Pantheon+ 配列
+# =========================
+# 行: z, mu_obs, sigma_mu, idsurvey（float64 で 4×N）
+_shm = None
+_data = None
+
+def share_data(sn_df):
+    """Copy the SN columns into one shared-memory block; returns (shm, shape)."""
+    arr = np.vstack([sn_df['z'].values, sn_df['mu_obs'].values,
+                     sn_df['sigma_mu'].values, sn_df['idsurvey'].values]).astype(float)
+    shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+    np.ndarray(arr.shape, dtype=float, buffer=shm.buf)[:] = arr
+    return shm, arr.shape
+
+def attach_data(name, shape):
+    # ワーカー初期化：コピーせずに共有ブロックを参照するだけ
+    global _shm, _data
+    _shm = shared_memory.SharedMemory(name=name)
+    _data = np.ndarray(shape, dtype=float, buffer=_shm.buf)
+
+def shared_arrays():
+    # ワーカー内で z, mu_obs, sigma_mu, idsurvey のビューを返す
+    return _data
+
+# =========================
+# 1 回分の再フィット（ワーカー側）
+# =========================
+def _refit(task):
+    model, x0, mode, label, seed = task
+    is_csgt, bounds = MODELS[model]
+    z, mu, sig, ids = shared_arrays()
+    if mode == 'bootstrap':
+        idx = np.random.default_rng(seed).integers(0, len(z), len(z))
+    else:
+        idx = np.flatnonzero(ids != label)  # jackknife: サーベイ label を除外
+    args = (is_csgt, z[idx], mu[idx], sig[idx])
+    t0 = time.perf_counter()
+    # 全データの最適値から局所最適化（ランダム集団からやり直さない）
+    res = minimize(chi2_final_extended, x0, args=args, method='L-BFGS-B', bounds=bounds)
+    return label, res.x, float(res.fun), len(idx), time.perf_counter() - t0
+
+# =========================
+# ブートストラップ / ジャックナイフ
+# =========================
+def run_resampling(model, x_full, mode='bootstrap', n=200, sn_df=None, processes=None, seed=0):
+    """
+    Refit `model` on resampled Pantheon+ data across a process pool.
+
+    mode='bootstrap' draws `n` resamples with replacement; mode='jackknife'
+    drops one IDSURVEY at a time (`n` is ignored). Every refit starts from
+    `x_full`, the full-sample optimum.
+    """
+    if mode not in ('bootstrap', 'jackknife'):
+        raise ValueError(f"unknown resampling mode: {mode}")
+    sn_df = load_pantheon(verbose=False) if sn_df is None else sn_df
+    x_full = np.asarray(x_full, dtype=float)
+    if mode == 'bootstrap':
+        seeds = np.random.SeedSequence(seed).generate_state(n)
+        tasks = [(model, x_full, mode, i, int(s)) for i, s in enumerate(seeds)]
+    else:
+        tasks = [(model, x_full, mode, int(s), None) for s in np.unique(sn_df['idsurvey'])]
+
+    shm, shape = share_data(sn_df)
+    t0 = time.perf_counter()
+    try:
+        with Pool(processes, initializer=attach_data, initargs=(shm.name, shape)) as pool:
+            out = pool.map(_refit, tasks, chunksize=max(1, len(tasks) // (4 * (processes or os.cpu_count()))))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    labels, xs, chi2, npts, times = zip(*out)
+    return {
+        'model': model, 'mode': mode, 'x_full': x_full,
+        'labels': np.array(labels), 'samples': np.array(xs), 'chi2': np.array(chi2),
+        'n_points': np.array(npts), 'fit_time': np.array(times),
+        'wall_time': time.perf_counter() - t0,
+    }
+
+# =========================
+# 集計：パラメータ分布と H(z), w(z) の誤差帯
+# =========================
+def param_summary(result):
+    s = result['samples']
+    if result['mode'] == 'jackknife':
+        # ジャックナイフ分散: (n-1)/n Σ (x_i - x̄)²
+        k = len(s)
+        err = np.sqrt((k - 1) / k * np.sum((s - s.mean(axis=0))**2, axis=0))
+    else:
+        err = s.std(axis=0, ddof=1)
+    lo, med, hi = np.percentile(s, [16, 50, 84], axis=0)
+    return {name: {'best': result['x_full'][i], 'median': med[i], 'err': err[i],
+                   'p16': lo[i], 'p84': hi[i]}
+            for i, name in enumerate(PARAM_NAMES[result['model']])}
+
+def bands(result, z_range, percentiles=(16, 50, 84)):
+    is_csgt = MODELS[result['model']][0]
+    curves = [get_H_w(z_range, x, is_csgt) for x in result['samples']]
+    w_all = np.array([c[0] for c in curves])
+    H_all = np.array([c[1] for c in curves])
+    return {'z': np.asarray(z_range),
+            'w': np.percentile(w_all, percentiles, axis=0),
+            'H': np.percentile(H_all, percentiles, axis=0)}
+
+def full_sample_optimum(model, sn_df, store=None):
+    # fit_store に保存された同じデータでの最新フィット
+    store = store or FitStore()
+    dhash = data_hash(sn_df['z'].values, sn_df['mu_obs'].values, sn_df['sigma_mu'].values)
+    recs = [r for r in store.records(model) if r['data_hash'] == dhash]
+    if not recs:
+        raise LookupError(f"no stored {model} fit for this dataset; run test.py first")
+    return max(recs, key=lambda r: r['finished'])['x']
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
+    MODE = 'bootstrap'   # 'bootstrap' or 'jackknife'
+    N_BOOT = 200
+
+    sn_df = load_pantheon()
+    z_axis = np.linspace(0.001, 2.3, 200)
+    fig, ax = plt.subplots(1, 2, figsize=(15, 6))
+    for model, color in (('csgt', 'r'), ('lcdm', 'b')):
+        res = run_resampling(model, full_sample_optimum(model, sn_df), MODE, N_BOOT, sn_df)
+        print(f"\n===== {model.upper()} {MODE}: {len(res['samples'])} refits in {res['wall_time']:.1f}s =====")
+        for name, s in param_summary(res).items():
+            print(f"{name:>8}: {s['best']:.4f}  ±{s['err']:.4f}  [{s['p16']:.4f}, {s['p84']:.4f}]")
+        b = bands(res, z_axis)
+        for i, key in enumerate(('w', 'H')):
+            ax[i].fill_between(z_axis, b[key][0], b[key][2], color=color, alpha=0.25)
+            ax[i].plot(z_axis, b[key][1], color=color, lw=2, label=f'{model.upper()} (median, 68%)')
+
+    ax[0].set_ylabel('Equation of State w(z)', fontsize=12)
+    ax[1].set_ylabel('H(z) [km/s/Mpc]', fontsize=12)
+    for a in ax:
+        a.set_xlabel('Redshift z', fontsize=12)
+        a.legend()
+        a.grid(alpha=0.3)
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from csgt_model import HERE, PANTHEON_FILE, comoving_distance_extended, unpack_params, bounds_csgt, bounds_lcdm
+
+FULL_INPUT_FILE = os.path.join(HERE, 'full_input.csv')
+C_KMS = 299792.458
+
+# =========================
+# データ読み込み（SALT2 ライトカーブ出力）
+# =========================
+def load_salt2(path=FULL_INPUT_FILE, pantheon_path=PANTHEON_FILE, zmin=0.01, verbose=True):
+    """
+    full_input.csv (mB, x1, c, COV_x1_c, HOST_LOGMASS, zCMB, zHEL, ...).
+    The CSV has no mB uncertainty, so mBERR is joined from Pantheon+SH0ES.dat
+    on CID + IDSURVEY; unmatched rows get the median mBERR.
+    """
+    df = pd.read_csv(path, index_col=0)
+    try:
+        pp = pd.read_csv(pantheon_path, sep=r'\s+', usecols=['CID', 'IDSURVEY', 'mBERR'])
+        pp.index = pp['CID'].astype(str) + '_' + pp['IDSURVEY'].astype(float).astype(str)
+        mb_err = pp['mBERR'][~pp.index.duplicated()]
+        df['mBERR'] = mb_err.reindex(df.index).fillna(mb_err.median()).values
+    except (OSError, ValueError, KeyError):
+        df['mBERR'] = 0.03
+    df = df[df['zCMB'] > zmin].sort_values('zCMB')
+    if verbose:
+        print(f"SALT2 catalog loaded: {len(df)} SNe (z > {zmin})")
+    return df
+
+# =========================
+# SALT2 標準化尤度
+# =========================
+NUISANCE_NAMES = ['alpha', 'beta', 'gamma']
+bounds_nuisance = [
+    (0.05, 0.30),   # alpha (x1 stretch)
+    (2.0, 4.5),     # beta (c color)
+    (-0.15, 0.15),  # gamma (host-mass step)
+]
+
+class SALT2Likelihood:
+    """
+    -2 ln L for mu = mB - M + alpha*x1 - beta*c + gamma*step(HOST_LOGMASS),
+    with the per-SN variance
+
+        mBERR² + alpha² x1ERR² + beta² cERR² - 2 alpha beta COV_x1_c
+               + sigma_int² + sigma_vpec²
+
+    mode='fit': params are the csgt_model vector (CSGT or LCDM, including M)
+        followed by [alpha, beta, gamma]; the ln(variance) term is kept
+        because the variance depends on alpha and beta.
+    mode='marginalize': params are the csgt_model vector *without* M. M,
+        alpha, beta and gamma enter the mean linearly and are marginalized
+        analytically (flat priors) with the variance frozen at
+        (alpha0, beta0), so the 4x4 normal matrix is built once.
+
+    Everything is whole-catalog array arithmetic: the only per-call cost
+    beyond the cosmology is a handful of length-N vector operations.
+    """
+
+    def __init__(self, df, mode='fit', sigma_int=0.1, sigma_vpec=250.0,
+                 mass_split=10.0, alpha0=0.15, beta0=3.1):
+        if mode not in ('fit', 'marginalize'):
+            raise ValueError(f"unknown SALT2 likelihood mode: {mode}")
+        self.mode = mode
+        # キャッシュキー用に設定を保持（alpha0/beta0 は marginalize でのみ効く）
+        self.config = {'sigma_int': sigma_int, 'sigma_vpec': sigma_vpec, 'mass_split': mass_split}
+        if mode == 'marginalize':
+            self.config.update(alpha0=alpha0, beta0=beta0)
+        self.z_cmb = df['zCMB'].values.astype(float)
+        self.z_hel = df['zHEL'].values.astype(float)
+        self.mB = df['mB'].values.astype(float)
+        self.x1 = df['x1'].values.astype(float)
+        self.c = df['c'].values.astype(float)
+        self.var_x1 = df['x1ERR'].values**2
+        self.var_c = df['cERR'].values**2
+        self.cov_x1c = df['COV_x1_c'].values.astype(float)
+        # 質量が無いもの（-9）は 0.5 とし、段差の半分だけ受ける
+        logm = df['HOST_LOGMASS'].values
+        self.step = np.where(logm > 0, (logm >= mass_split).astype(float), 0.5)
+        # 質量・色に依らない分散（mB誤差 + 固有分散 + 特異速度）
+        sig_vpec = 5.0 / np.log(10) * (sigma_vpec / C_KMS) / self.z_cmb
+        self.var_fixed = df['mBERR'].values**2 + sigma_int**2 + sig_vpec**2
+
+        if mode == 'marginalize':
+            # 線形パラメータ θ = [M, alpha, beta, gamma]: mu_obs - mu_th = d + X θ
+            self.X = np.column_stack([-np.ones_like(self.mB), self.x1, -self.c, self.step])
+            self.w = 1.0 / self.variance(alpha0, beta0)
+            self.XtW = self.X.T * self.w
+            self.F_inv = np.linalg.inv(self.XtW @ self.X)
+
+    def data_hash(self):
+        """fit_store data hash over every input array and the likelihood settings."""
+        from fit_store import data_hash
+        config = [self.config[k] for k in sorted(self.config)]
+        return data_hash(self.z_cmb, self.z_hel, self.mB, self.x1, self.c, self.var_x1,
+                         self.var_c, self.cov_x1c, self.step, self.var_fixed, config)
+
+    def variance(self, alpha, beta):
+        return (self.var_fixed + alpha**2 * self.var_x1 + beta**2 * self.var_c
+                - 2.0 * alpha * beta * self.cov_x1c)
+
+    def mu_theory(self, A, sigma, zp_peak, H0, Om, w_off):
+        # 共動距離は zCMB、光度距離の (1+z) は zHEL
+        chi = comoving_distance_extended(self.z_cmb, A, sigma, zp_peak, Om, w_off)
+        dL = (1 + self.z_hel) * chi * (C_KMS / H0)
+        return 5.0 * np.log10(dL * 1e6 / 10.0)
+
+    def __call__(self, params, is_csgt):
+        params = list(params)
+        try:
+            if self.mode == 'fit':
+                alpha, beta, gamma = params[-3:]
+                A, sigma, zp_peak, M, H0, Om, w_off = unpack_params(params[:-3], is_csgt)
+                mu_th = self.mu_theory(A, sigma, zp_peak, H0, Om, w_off)
+                r = self.mB - M + alpha * self.x1 - beta * self.c + gamma * self.step - mu_th
+                var = self.variance(alpha, beta)
+                return np.sum(r**2 / var + np.log(var))
+            # M を 0 として埋めてから展開
+            params.insert(3 if is_csgt else 0, 0.0)
+            A, sigma, zp_peak, _, H0, Om, w_off = unpack_params(params, is_csgt)
+            d = self.mB - self.mu_theory(A, sigma, zp_peak, H0, Om, w_off)
+            b = self.XtW @ d
+            return d @ (self.w * d) - b @ self.F_inv @ b
+        except Exception:
+            return 1e18
+
+    def best_nuisance(self, params, is_csgt):
+        """[M, alpha, beta, gamma] maximizing L at a cosmology (marginalize mode)."""
+        params = list(params)
+        params.insert(3 if is_csgt else 0, 0.0)
+        A, sigma, zp_peak, _, H0, Om, w_off = unpack_params(params, is_csgt)
+        d = self.mB - self.mu_theory(A, sigma, zp_peak, H0, Om, w_off)
+        return -self.F_inv @ (self.XtW @ d)
+
+def salt2_bounds(is_csgt, mode):
+    bounds = list(bounds_csgt if is_csgt else bounds_lcdm)
+    m = 3 if is_csgt else 0
+    if mode == 'marginalize':
+        return bounds[:m] + bounds[m + 1:]
+    bounds[m] = (-19.6, -19.0)  # 生の mB なので M を広めに
+    return bounds + bounds_nuisance
+
+if __name__ == '__main__':
+    from fit_store import FitStore, run_fit
+
+    MODE = 'marginalize'   # 'fit' or 'marginalize'
+    df = load_salt2()
+    like = SALT2Likelihood(df, mode=MODE)
+    dhash = like.data_hash()
+    store = FitStore()
+
+    results = {}
+    for model, is_csgt in (('csgt', True), ('lcdm', False)):
+        results[model] = run_fit(like, salt2_bounds(is_csgt, MODE), f'{model}-salt2-{MODE}', dhash,
+                                 args=(is_csgt,), store=store, workers=1, tol=0.001)
+        x = results[model]['x']
+        nuis = like.best_nuisance(x, is_csgt) if MODE == 'marginalize' else [x[3 if is_csgt else 0]] + x[-3:]
+        print(f"{model.upper()}: chi2={results[model]['fun']:.3f}  M={nuis[0]:.3f}  "
+              f"alpha={nuis[1]:.3f}  beta={nuis[2]:.3f}  gamma={nuis[3]:.3f}")
+
+    print(f"\nDelta chi2 (SALT2, {MODE}) = {results['lcdm']['fun'] - results['csgt']['fun']:.4f}")
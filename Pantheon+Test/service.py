@@ -0,0 +1,377 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+import numpy as np
+
+# fit_store と同じ保存先（fit_store を import すると SciPy まで読み込まれるので直接指定）
+HERE = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(HERE, 'fit_results')
+
+ADDRESS = ('127.0.0.1', 6150)
+REQUEST_TIMEOUT = 30.0   # 認証後、リクエスト本体を待つ秒数
+AUTHKEY_FILE = os.path.join(STORE_DIR, 'service.key')
+JOB_DIR = os.path.join(STORE_DIR, 'jobs')
+
+KINDS = ('fit', 'scan', 'forecast')
+DATASETS = ('pantheon', 'salt2-fit', 'salt2-marginalize')
+# 種類ごとに受け付ける options（fit は結果を左右する DE 設定だけ）
+OPTIONS = {
+    'fit': ('strategy', 'maxiter', 'popsize', 'tol', 'atol', 'mutation', 'recombination', 'polish'),
+    'scan': ('names', 'grids', 'x_best', 'processes'),
+    'forecast': ('params', 'z'),
+}
+
+# =========================
+# 認証鍵（ユーザーごとに乱数で生成、0600 で保存）
+# =========================
+def load_authkey(path=AUTHKEY_FILE):
+    """
+    Per-user random key for the socket handshake. Messages are pickles, so
+    only processes that can read this file may talk to the service.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.stat(path).st_mode & 0o077:
+            os.chmod(path, 0o600)
+        with open(path, 'rb') as f:
+            return bytes.fromhex(f.read().decode().strip())
+    key = secrets.token_bytes(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key.hex())
+    return key
+
+# =========================
+# ジョブ仕様
+# =========================
+def normalize_spec(spec):
+    """
+    Fill defaults and validate a job spec:
+    {'kind', 'model', 'dataset', 'bounds', 'seed', 'options'}.
+
+    Everything that changes the result is filled in here (DE defaults, the
+    scan's starting point, the forecast grid), so the job id hashes what
+    actually runs. Bad specs raise ValueError at submit time.
+    """
+    from csgt_model import PARAM_NAMES, bounds_csgt, bounds_lcdm
+    from salt2 import salt2_bounds
+
+    spec = dict(spec)
+    kind, model = spec.get('kind', 'fit'), spec.get('model', 'csgt')
+    dataset = spec.get('dataset', 'pantheon')
+    if kind not in KINDS:
+        raise ValueError(f"unknown job kind: {kind}")
+    if model not in ('csgt', 'lcdm'):
+        raise ValueError(f"unknown model: {model}")
+    if dataset not in DATASETS:
+        raise ValueError(f"unknown dataset: {dataset}")
+    if kind == 'scan' and (dataset != 'pantheon' or model != 'csgt'):
+        raise ValueError("profile scans are only available for csgt on pantheon")
+    options = spec.get('options') or {}
+    if not isinstance(options, dict):
+        raise ValueError("options must be a dict")
+    unknown = set(options) - set(OPTIONS[kind])
+    if unknown:
+        raise ValueError(f"unknown {kind} options: {sorted(unknown)}")
+    if kind == 'fit':
+        from fit_store import de_options
+        options = de_options(**options)
+    elif kind == 'scan':
+        names, grids = options.get('names'), options.get('grids')
+        if not names or not grids or len(names) not in (1, 2) or len(grids) != len(names):
+            raise ValueError("scan needs 'names' (one or two parameters) and one 'grids' entry each")
+        if not set(names) <= set(PARAM_NAMES['csgt']):
+            raise ValueError(f"unknown scan parameters: {sorted(set(names) - set(PARAM_NAMES['csgt']))}")
+        if any(len(g) != 3 for g in grids):
+            raise ValueError("each scan grid is [start, stop, num]")
+        options = dict(options, names=list(names),
+                       grids=[[float(a), float(b), int(n)] for a, b, n in grids],
+                       processes=int(options.get('processes', 1)))
+        if options.get('x_best') is None:
+            # 省略時は保存済みの全データ最適値を今ここで決めてジョブ id に含める
+            from resampling import full_sample_optimum
+            options['x_best'] = full_sample_optimum('csgt', _pantheon())
+        options['x_best'] = [float(v) for v in options['x_best']]
+        if len(options['x_best']) != len(PARAM_NAMES['csgt']):
+            raise ValueError(f"x_best needs {len(PARAM_NAMES['csgt'])} values")
+    else:
+        n_params = len(PARAM_NAMES[model])
+        if options.get('params') is None or len(options['params']) != n_params:
+            raise ValueError(f"forecast needs 'params' with {n_params} values for {model}")
+        z = options.get('z', (0.01, 2.3, 100))
+        if len(z) != 3:
+            raise ValueError("forecast 'z' is [start, stop, num]")
+        options = dict(options, params=[float(v) for v in options['params']],
+                       z=[float(z[0]), float(z[1]), int(z[2])])
+    if spec.get('bounds') is None:
+        if dataset == 'pantheon':
+            spec['bounds'] = bounds_csgt if model == 'csgt' else bounds_lcdm
+        else:
+            spec['bounds'] = salt2_bounds(model == 'csgt', dataset.split('-')[1])
+    spec.update(kind=kind, model=model, dataset=dataset,
+                bounds=[[float(lo), float(hi)] for lo, hi in spec['bounds']],
+                seed=spec.get('seed'), options=options)
+    return spec
+
+def job_id(spec):
+    return spec['kind'] + '-' + hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+# =========================
+# ワーカー（データは起動時に一度だけ読み込む）
+# =========================
+# SciPy などの重い import はワーカー側だけで行い、クライアントは軽いまま
+_datasets = {}
+
+def _pantheon():
+    # サーバー本体でもスキャンの x_best を決めるのに使う（一度だけ読む）
+    if 'pantheon' not in _datasets:
+        from csgt_model import load_pantheon
+        _datasets['pantheon'] = load_pantheon(verbose=False)
+    return _datasets['pantheon']
+
+def _preload():
+    global _datasets
+    from csgt_model import load_pantheon
+    from salt2 import load_salt2, SALT2Likelihood
+    sn_df = load_pantheon(verbose=False)
+    salt = load_salt2(verbose=False)
+    _datasets = {
+        'pantheon': sn_df,
+        'salt2-fit': SALT2Likelihood(salt, mode='fit'),
+        'salt2-marginalize': SALT2Likelihood(salt, mode='marginalize'),
+    }
+
+def _objective(spec):
+    from csgt_model import chi2_final_extended
+    from fit_store import data_hash
+    is_csgt = spec['model'] == 'csgt'
+    data = _datasets[spec['dataset']]
+    if spec['dataset'] == 'pantheon':
+        arrays = (data['z'].values, data['mu_obs'].values, data['sigma_mu'].values)
+        return chi2_final_extended, (is_csgt,) + arrays, spec['model'], data_hash(*arrays)
+    return data, (is_csgt,), f"{spec['model']}-salt2-{data.mode}", data.data_hash()
+
+def _run_job(spec):
+    from csgt_model import get_H_w, get_mu_theory_extended, unpack_params
+    from fit_store import run_fit
+    from profile_scan import profile_scan
+
+    opts = spec['options']
+    t0 = time.perf_counter()
+    if spec['kind'] == 'fit':
+        func, args, model, dhash = _objective(spec)
+        # options は fit_store のキーにも入るので、ジョブ id と保存キーが一致する
+        result = run_fit(func, spec['bounds'], model, dhash, args=args, seed=spec['seed'],
+                         verbose=False, workers=1, **opts)
+    elif spec['kind'] == 'scan':
+        grids = [np.linspace(*g) for g in opts['grids']]   # [start, stop, num]
+        # 並列化はサービス側のプールで行うのでスキャン自体は既定で 1 プロセス
+        result = profile_scan(opts['names'], grids, opts['x_best'], _datasets['pantheon'],
+                              bounds=spec['bounds'], processes=opts['processes'])
+    else:
+        # forecast: 与えたパラメータでの H(z), w(z), mu(z) の予言
+        is_csgt = spec['model'] == 'csgt'
+        z = np.linspace(*opts['z'])
+        w, H = get_H_w(z, opts['params'], is_csgt)
+        A, sigma, zp, M, H0, Om, w_off = unpack_params(opts['params'], is_csgt)
+        result = {'z': z, 'w': w, 'H': H,
+                  'mu': get_mu_theory_extended(z, A, sigma, zp, 0.0, H0, Om, w_off)}
+    return {'result': result, 'elapsed': time.perf_counter() - t0}
+
+# =========================
+# サービス本体
+# =========================
+class FitService:
+    """
+    Deduplicating job scheduler: identical specs share one job id; finished
+    results are pickled under fit_results/jobs/ and served from there.
+    """
+
+    def __init__(self, workers=None):
+        os.makedirs(JOB_DIR, exist_ok=True)
+        self.pool = ProcessPoolExecutor(workers, initializer=_preload)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def _cache_path(self, jid):
+        return os.path.join(JOB_DIR, jid + '.pkl')
+
+    def submit(self, spec):
+        spec = normalize_spec(spec)
+        jid = job_id(spec)
+        with self.lock:
+            job = self.jobs.get(jid)
+            if job is not None and not (job['future'] and job['future'].done() and job['future'].exception()):
+                return jid
+            if os.path.exists(self._cache_path(jid)):
+                self.jobs[jid] = {'spec': spec, 'future': None, 'submitted': time.time()}
+                return jid
+            fut = self.pool.submit(_run_job, spec)
+            fut.add_done_callback(lambda f, jid=jid: self._store(jid, f))
+            self.jobs[jid] = {'spec': spec, 'future': fut, 'submitted': time.time()}
+        return jid
+
+    def _store(self, jid, fut):
+        if fut.exception() is None:
+            with open(self._cache_path(jid), 'wb') as f:
+                pickle.dump(fut.result(), f)
+
+    def poll(self, jid):
+        with self.lock:
+            job = self.jobs.get(jid)
+        if job is None and os.path.exists(self._cache_path(jid)):
+            job = {'future': None}
+        if job is None:
+            return {'job_id': jid, 'status': 'unknown'}
+        fut = job['future']
+        if fut is None:
+            with open(self._cache_path(jid), 'rb') as f:
+                out = pickle.load(f)
+            return {'job_id': jid, 'status': 'done', 'cached': True, **out}
+        if fut.done() and fut.exception() is None:
+            return {'job_id': jid, 'status': 'done', 'cached': False, **fut.result()}
+        if fut.done():
+            return {'job_id': jid, 'status': 'failed', 'error': repr(fut.exception())}
+        return {'job_id': jid, 'status': 'running' if fut.running() else 'queued'}
+
+    def list(self):
+        with self.lock:
+            jids = list(self.jobs)
+        return [{k: v for k, v in self.poll(j).items() if k in ('job_id', 'status')} for j in jids]
+
+    def handle(self, msg):
+        op = msg.get('op')
+        if op == 'submit':
+            return {'job_id': self.submit(msg['spec'])}
+        if op == 'poll':
+            return self.poll(msg['job_id'])
+        if op == 'list':
+            return {'jobs': self.list()}
+        raise ValueError(f"unknown op: {op}")
+
+    def serve(self, address=ADDRESS, authkey=None):
+        """
+        Accept loop. The main thread only accepts sockets; the auth handshake,
+        the request and the reply all run in a per-connection thread, so a
+        slow or silent peer cannot hold up other clients.
+        """
+        authkey = authkey or load_authkey()
+        # 認証は accept() ではなく接続ごとのスレッドで行う
+        with Listener(address) as listener:
+            print(f"Fit service listening on {address[0]}:{address[1]}")
+            while not self.stopping.is_set():
+                try:
+                    conn = listener.accept()
+                except OSError as e:
+                    print(f"Accept failed: {e!r}")
+                    continue
+                if self.stopping.is_set():
+                    conn.close()
+                    break
+                threading.Thread(target=self._connection, args=(conn, authkey, address),
+                                 daemon=True).start()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _connection(self, conn, authkey, address):
+        try:
+            deliver_challenge(conn, authkey)
+            answer_challenge(conn, authkey)
+            if not conn.poll(REQUEST_TIMEOUT):
+                raise TimeoutError(f"no request within {REQUEST_TIMEOUT:.0f}s")
+            msg = conn.recv()
+        except Exception as e:
+            # 鍵が違う・途中で切断された・送ってこないクライアントは閉じるだけ
+            print(f"Rejected connection: {e!r}")
+            conn.close()
+            return
+        if not isinstance(msg, dict):
+            self._send(conn, {'status': 'error', 'error': 'request must be a dict'})
+        elif msg.get('op') == 'shutdown':
+            self._send(conn, {'status': 'shutting down'})
+            self.stopping.set()
+            # accept() で待っているメインスレッドを起こす
+            try:
+                socket.create_connection(address, timeout=5).close()
+            except OSError:
+                pass
+        else:
+            self._reply(conn, msg)
+
+    @staticmethod
+    def _send(conn, reply):
+        try:
+            conn.send(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _reply(self, conn, msg):
+        try:
+            reply = self.handle(msg)
+        except Exception as e:
+            reply = {'status': 'error', 'error': repr(e)}
+        self._send(conn, reply)
+
+# =========================
+# クライアント
+# =========================
+def request(msg, address=ADDRESS, authkey=None):
+    with Client(address, authkey=authkey or load_authkey()) as conn:
+        conn.send(msg)
+        return conn.recv()
+
+def submit(spec, **kw):
+    out = request({'op': 'submit', 'spec': spec}, **kw)
+    if 'job_id' not in out:
+        raise RuntimeError(out.get('error', out))
+    return out['job_id']
+
+def poll(jid, **kw):
+    return request({'op': 'poll', 'job_id': jid}, **kw)
+
+def wait(jid, interval=2.0, **kw):
+    while True:
+        out = poll(jid, **kw)
+        if out['status'] not in ('queued', 'running'):
+            return out
+        time.sleep(interval)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local CSGT fit-job service')
+    parser.add_argument('--port', type=int, default=ADDRESS[1])
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('serve')
+    p.add_argument('--workers', type=int, default=None)
+    p = sub.add_parser('submit')
+    p.add_argument('spec', help='JSON job spec, e.g. \'{"kind": "fit", "model": "lcdm"}\'')
+    p.add_argument('--wait', action='store_true')
+    p = sub.add_parser('poll')
+    p.add_argument('job_id')
+    sub.add_parser('list')
+    sub.add_parser('shutdown')
+    a = parser.parse_args()
+
+    address = (ADDRESS[0], a.port)
+    if a.cmd == 'serve':
+        FitService(a.workers).serve(address)
+    elif a.cmd == 'submit':
+        jid = submit(json.loads(a.spec), address=address)
+        print(jid)
+        if a.wait:
+            print(wait(jid, address=address))
+    elif a.cmd == 'poll':
+        print(poll(a.job_id, address=address))
+    else:
+        print(request({'op': a.cmd}, address=address))
@@ -4,11 +4,27 @@ import matplotlib.pyplot as plt
 from scipy.integrate import quad
 from scipy.interpolate import interp1d
 
+from fit_store import FitStore
+
 # =========================
-# 前回の最適化結果（勝利パラメータ）
+# 最適化結果の読み込み（fit_results/ から）
 # =========================
-res_csgt_x = [0.010, 0.100, 1.200, -19.34, 72.99, 0.35, -1.10] # A, sigma, zp, M, H0, Om, w_off
-res_lcdm_x = [-19.34, 72.99, 0.35] # M, H0, Om
+# キーを指定しなければ各モデルの最新の結果を使う（test.py の出力に表示される）
+KEY_CSGT = None
+KEY_LCDM = None
+
+def load_fit(store, key, model, fallback):
+    rec = store.load(key) if key else store.latest(model)
+    if rec is None:
+        print(f"No stored {model} fit, using fallback parameters.")
+        return fallback
+    print(f"{model}: {rec['key']} (chi2={rec['fun']:.4f})")
+    return rec['x']
+
+# 保存庫が空のときは前回の勝利パラメータ
+store = FitStore()
+res_csgt_x = load_fit(store, KEY_CSGT, 'csgt', [0.010, 0.100, 1.200, -19.34, 72.99, 0.35, -1.10]) # A, sigma, zp, M, H0, Om, w_off
+res_lcdm_x = load_fit(store, KEY_LCDM, 'lcdm', [-19.34, 72.99, 0.35]) # M, H0, Om
 
 # =========================
 # グラフ用計算関数
@@ -45,7 +61,7 @@ _, w_lcdm, H_lcdm = get_plot_data(res_lcdm_x, False)
 fig, ax = plt.subplots(1, 2, figsize=(15, 6))
 
 # 左図：状態方程式 w(z)
-ax[0].plot(z_axis, w_csgt, 'r-', lw=2, label='CSGT (A=0.01, z_p=1.2)')
+ax[0].plot(z_axis, w_csgt, 'r-', lw=2, label=f'CSGT (A={res_csgt_x[0]:.2f}, z_p={res_csgt_x[2]:.1f})')
 ax[0].plot(z_axis, w_lcdm, 'b--', lw=2, label='ΛCDM (w=-1)')
 ax[0].axhline(-1, color='gray', linestyle=':', alpha=0.5)
 ax[0].set_xlabel('Redshift z', fontsize=12)
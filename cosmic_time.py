@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# --- Constants ---
+HUBBLE_TIME_GYR = 977.792  # 1/H0 in Gyr for H0 in km/s/Mpc
+A_MIN = 1e-5               # Start of the grid (z ~ 1e5), matter era
+A_MAX = 20.0               # Far future (z = -0.95)
+N_GRID = 4000
+Z_MIN = 1.0 / A_MAX - 1.0  # Furthest future covered by the tables
+CACHE_SIZE = 2048          # Tables kept by the default LRU cache (~32 KB each)
+
+# Shared ln(a) grid: every model is tabulated on the same nodes.
+# Spacing is uniform in ln(a) and today (ln a = 0) is an exact node.
+_DLN = (np.log(A_MAX) - np.log(A_MIN)) / (N_GRID - 1)
+I_TODAY = int(round(-np.log(A_MIN) / _DLN))
+LN_A = np.concatenate([np.linspace(np.log(A_MIN), 0.0, I_TODAY + 1),
+                       np.linspace(0.0, np.log(A_MAX), N_GRID - I_TODAY)[1:]])
+A_GRID = np.exp(LN_A)
+Z_GRID = 1.0 / A_GRID - 1.0
+
+# --- w(z) models used across the project ---
+def w_lcdm(z, params):
+    return np.full_like(z, -1.0)
+
+def w_csgt(z, params):
+    """Gaussian bump on a constant offset: params = (A, sigma, z_peak, w_off)."""
+    A, sigma, zp, w_off = (params[..., i:i+1] for i in range(4))
+    return w_off + A * np.exp(-(z - zp)**2 / (2 * sigma**2))
+
+def tabulated_w(z_nodes, w_nodes):
+    """w(z) from a table (e.g. the dissipative engine's output); flat outside it."""
+    order = np.argsort(z_nodes)
+    z_nodes, w_nodes = np.asarray(z_nodes)[order], np.asarray(w_nodes)[order]
+    return lambda z, params: np.interp(z, z_nodes, w_nodes)
+
+W_MODELS = {'lcdm': w_lcdm, 'csgt': w_csgt}
+
+# --- Tables ---
+class TimeTable:
+    """
+    Cosmic time on the shared grid for one parameter vector.
+    t is the age in Gyr at each grid node; z < 0 is the future.
+
+    The tables cover Z_MIN <= z <= 1/A_MIN - 1, i.e. down to z = -0.95
+    (a = 20), not z = -1 itself. Redshifts or ages outside that range give
+    NaN instead of being clamped to the edge.
+    """
+
+    def __init__(self, t):
+        self.t = t
+        self.age0 = float(t[I_TODAY])
+
+    def age(self, z):
+        z = np.asarray(z, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ln_a = np.where(z > -1.0, -np.log1p(np.maximum(z, Z_MIN - 1.0)), np.inf)
+        return np.interp(ln_a, LN_A, self.t, left=np.nan, right=np.nan)
+
+    def lookback(self, z):
+        return self.age0 - self.age(z)
+
+    def z_of_age(self, t):
+        return np.expm1(-np.interp(t, self.t, LN_A, left=np.nan, right=np.nan))
+
+    def z_of_lookback(self, t_lb):
+        return self.z_of_age(self.age0 - np.asarray(t_lb))
+
+def _age_tables(H0, Om, w, params):
+    # params: (M, p) -> ages (M, N_GRID) in Gyr, one cumulative pass per row
+    wz = W_MODELS[w](Z_GRID[None, :], params) if isinstance(w, str) else w(Z_GRID[None, :], params)
+    wz = np.broadcast_to(wz, (len(params), N_GRID))
+    # rho_DE(a)/rho_DE0 = exp(-3 * int_0^{ln a} (1 + w) d ln a)
+    f = 1.0 + wz
+    cum = np.concatenate([np.zeros((len(params), 1)),
+                          np.cumsum(0.5 * (f[:, 1:] + f[:, :-1]) * np.diff(LN_A), axis=1)], axis=1)
+    cum -= cum[:, [I_TODAY]]
+    Om = np.broadcast_to(np.asarray(Om, dtype=float), (len(params),))[:, None]
+    H0 = np.broadcast_to(np.asarray(H0, dtype=float), (len(params),))[:, None]
+    E = np.sqrt(Om * A_GRID**-3 + (1.0 - Om) * np.exp(-3.0 * cum))
+    # dt = d ln a / H; before A_MIN the universe is matter dominated
+    g = 1.0 / E
+    t = np.concatenate([np.zeros((len(params), 1)),
+                        np.cumsum(0.5 * (g[:, 1:] + g[:, :-1]) * np.diff(LN_A), axis=1)], axis=1)
+    t += 2.0 / (3.0 * np.sqrt(Om)) * A_MIN**1.5
+    return t * HUBBLE_TIME_GYR / H0
+
+class LRUCache(OrderedDict):
+    """Least-recently-used dict capped at `maxsize` entries."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+_cache = LRUCache()
+
+def time_tables(H0, Om, w='lcdm', params=None, cache=None):
+    """
+    TimeTables for a batch of models sharing one w(z) family ('lcdm', 'csgt'
+    or a callable w(z, params) such as tabulated_w(...)).
+    H0 and Om may be scalars or per-model arrays; params is (M, p).
+    Rows already computed for the same (w, H0, Om, params) come from `cache`
+    (any dict-like; default: a module-level LRUCache of CACHE_SIZE tables).
+    Callables are keyed by identity, so reuse one tabulated_w(...) object
+    across calls.
+    """
+    cache = _cache if cache is None else cache
+    params = np.atleast_2d(np.zeros((1, 0)) if params is None else np.asarray(params, dtype=float))
+    n = len(params)
+    H0s = np.broadcast_to(np.asarray(H0, dtype=float), (n,))
+    Oms = np.broadcast_to(np.asarray(Om, dtype=float), (n,))
+    keys = [(w, float(h), float(o), tuple(p)) for h, o, p in zip(H0s, Oms, params)]
+    tables = [cache.get(k) for k in keys]
+    todo = [i for i, tab in enumerate(tables) if tab is None]
+    if todo:
+        ages = _age_tables(H0s[todo], Oms[todo], w, params[todo])
+        for i, t in zip(todo, ages):
+            tables[i] = TimeTable(t)
+            cache[keys[i]] = tables[i]
+    return tables
+
+def time_table(H0, Om, w='lcdm', params=(), cache=None):
+    return time_tables(H0, Om, w, [params], cache)[0]
+
+def clear_cache():
+    _cache.clear()
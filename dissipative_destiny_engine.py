@@ -1,11 +1,18 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from cosmic_time import time_table
+
 # --- Cosmic Constants ---
-T_UNIV = 13.8  # Gyr
+H0, OMEGA_M = 67.4, 0.315  # Background used for the time mapping
 Z0 = 0.8       # Information transition peak
 Z_RANGE = np.linspace(3, 0, 300)  # From Past(z=3) to Present(z=0)
 
+# Real cosmic time along Z_RANGE (cached table, one interpolation)
+TIMES = time_table(H0, OMEGA_M)
+T_UNIV = TIMES.age0          # Gyr (~13.8)
+T_RANGE = TIMES.age(Z_RANGE)  # Gyr, increasing
+
 def simulate_dissipative_dynamics(tau_end, beta=0.15, gamma=1.2):
     """
     beta: Dissipation rate (Selective Forgetting)
@@ -18,8 +25,8 @@ def simulate_dissipative_dynamics(tau_end, beta=0.15, gamma=1.2):
     # Numerical Integration of the Dissipative Logistic Equation
     # dD/dt = k*D*(1-D) - beta*exp(-gamma*z)*D
     for i in range(1, len(Z_RANGE)):
-        dz = Z_RANGE[i-1] - Z_RANGE[i]
-        dt = dz  # Simplified time-step mapping
+        # Time step in units of the present age, so k*tau_end/T_UNIV stays fixed
+        dt = (T_RANGE[i] - T_RANGE[i-1]) / T_UNIV
         
         # Logistic Growth Term
         growth = k * D[i-1] * (1 - D[i-1])
@@ -30,7 +37,7 @@ def simulate_dissipative_dynamics(tau_end, beta=0.15, gamma=1.2):
 
     # Metabolic Rate (L_eff) and Equation of State (w_z)
     # Using dD/dt to derive the dynamic pressure of information
-    L_eff = np.gradient(D, -Z_RANGE)
+    L_eff = np.gradient(D, T_RANGE)
     L_norm = L_eff / np.max(L_eff)
     
     # Theoretical w(z) from Information Gradient
@@ -0,0 +1,318 @@
+import os
+import time
+
+import numpy as np
+
+# --- Constants ---
+C_KMS = 299792.458
+OMEGA_GAMMA_H2 = 2.469e-5                      # Photons (T_CMB = 2.7255 K)
+OMEGA_R_H2 = OMEGA_GAMMA_H2 * (1 + 0.2271 * 3.046)  # + massless neutrinos
+Z_STAR = 1089.92                               # Photon decoupling (Planck 2018)
+Z_MAX = 1e5                                    # Top of the background grid
+N_GRID = 3000
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, 'Pantheon+Test')
+
+# Parameters understood by the background and the probes.
+# Or=None -> radiation from H0 (photons + neutrinos); rd=None -> fitting formula.
+DEFAULTS = {
+    'H0': 67.4, 'Om': 0.315, 'Or': None,
+    'A': 0.0, 'sigma': 1.0, 'z_peak': 0.7, 'w_off': -1.0,
+    'M': 0.0, 'sigma8': 0.811, 'ombh2': 0.02237, 'rd': None,
+}
+
+# --- Shared background ---
+class Background:
+    """
+    H(z), comoving distance, growth and sound horizon for a batch of B
+    parameter vectors, tabulated once on a grid that contains every redshift
+    requested by the probes as an exact node.
+    """
+
+    def __init__(self, grid, p):
+        self.z = grid
+        self.p = p
+        x = np.log1p(grid)
+        dx = np.diff(x)
+        B = len(p['H0'])
+
+        def cumtrapz(f):
+            return np.concatenate([np.zeros((B, 1)), np.cumsum(0.5 * (f[:, 1:] + f[:, :-1]) * dx, axis=1)], axis=1)
+
+        col = {k: v[:, None] for k, v in p.items()}
+        h2 = (col['H0'] / 100.0)**2
+        Or = col['Or']
+        # w(z) = w_off + A exp(-(z - z_peak)^2 / 2 sigma^2) (CSGT; LCDM is A=0, w_off=-1)
+        self.w = col['w_off'] + col['A'] * np.exp(-(grid - col['z_peak'])**2 / (2 * col['sigma']**2))
+        de = np.exp(3.0 * cumtrapz(1.0 + self.w))
+        zp1 = 1.0 + grid
+        self.E = np.sqrt(col['Om'] * zp1**3 + Or * zp1**4 + (1.0 - col['Om'] - Or) * de)
+        self.H = col['H0'] * self.E
+        # chi = int dz / E = int (1+z)/E dln(1+z), in Mpc
+        self.D_M = C_KMS / col['H0'] * cumtrapz(zp1 / self.E)
+
+        # Growth: f = Om(z)^0.55, D(z)/D(0) = exp(-int f dln(1+z))
+        Om_z = col['Om'] * zp1**3 / self.E**2
+        self.f = Om_z**0.55
+        self.growth = np.exp(-cumtrapz(self.f))
+
+        # Sound horizon r_s(z) = int_z^inf c_s / H dz; matter+radiation tail above Z_MAX
+        R_b = 3.0 * col['ombh2'] / (4.0 * OMEGA_GAMMA_H2) / zp1
+        g = C_KMS / np.sqrt(3.0 * (1.0 + R_b)) / self.H * zp1
+        I = cumtrapz(g)
+        zt = zp1[-1]
+        # int_{x_t}^inf dx / sqrt(Om x^3 + Or x^4) = 2 (sqrt(Or + Om/x_t) - sqrt(Or)) / Om
+        tail = C_KMS / (np.sqrt(3.0) * col['H0']) * 2.0 * (
+            np.sqrt(Or + col['Om'] / zt) - np.sqrt(Or)) / col['Om']
+        self.r_s = I[:, -1:] - I + tail
+        # r_d: Aubourg et al. (2015) fit unless given
+        rd_fit = 55.154 * np.exp(-72.3 * (0.00064 + 0.0006)**2) / (
+            (col['Om'] * h2)**0.25351 * col['ombh2']**0.12807)
+        self.rd = np.where(np.isnan(col['rd']), rd_fit, col['rd'])[:, 0]
+
+    def view(self, idx):
+        return BackgroundView(self, idx)
+
+class BackgroundView:
+    """Background restricted to one probe's redshifts (precomputed grid indices)."""
+
+    def __init__(self, bg, idx):
+        self.bg, self.idx, self.p = bg, idx, bg.p
+        self.z = bg.z[idx]
+
+    @property
+    def H(self):
+        return self.bg.H[:, self.idx]
+
+    @property
+    def D_M(self):
+        return self.bg.D_M[:, self.idx]
+
+    @property
+    def D_H(self):
+        return C_KMS / self.H
+
+    @property
+    def D_V(self):
+        return (self.z * self.D_M**2 * self.D_H)**(1.0 / 3.0)
+
+    @property
+    def D_L(self):
+        return (1.0 + self.z) * self.D_M
+
+    @property
+    def r_s(self):
+        return self.bg.r_s[:, self.idx]
+
+    @property
+    def fs8(self):
+        return self.bg.f[:, self.idx] * self.p['sigma8'][:, None] * self.bg.growth[:, self.idx]
+
+    @property
+    def rd(self):
+        return self.bg.rd
+
+# --- Probes ---
+# Each probe names the redshifts it needs and returns chi2 with shape (B,).
+class SNProbe:
+    """
+    Distance moduli. With marginalize_M the offset (M, and with it H0) is
+    marginalized analytically; otherwise mu_th + M as in the Pantheon+ fits.
+    """
+    name = 'SN'
+
+    def __init__(self, z, mu, sigma_mu, marginalize_M=True):
+        self.z, self.mu, self.w = np.asarray(z, float), np.asarray(mu, float), 1.0 / np.asarray(sigma_mu, float)**2
+        self.marginalize_M = marginalize_M
+
+    @classmethod
+    def pantheon(cls, path=os.path.join(DATA_DIR, 'Pantheon+SH0ES.dat'), **kw):
+        import pandas as pd
+        df = pd.read_csv(path, sep=r'\s+', usecols=['zHD', 'MU_SH0ES', 'MU_SH0ES_ERR_DIAG'])
+        return cls(df['zHD'].values, df['MU_SH0ES'].values, df['MU_SH0ES_ERR_DIAG'].values, **kw)
+
+    def redshifts(self):
+        return self.z
+
+    def chi2(self, bg):
+        mu_th = 5.0 * np.log10(bg.D_L) + 25.0
+        r = self.mu - mu_th
+        if self.marginalize_M:
+            return np.sum(r**2 * self.w, axis=1) - np.sum(r * self.w, axis=1)**2 / np.sum(self.w)
+        r = r - bg.p['M'][:, None]
+        return np.sum(r**2 * self.w, axis=1)
+
+class BAOProbe:
+    """Correlated BAO measurements: DV/DM/DH over r_d, or H(z) in km/s/Mpc."""
+    name = 'BAO'
+    QUANTITIES = ('DV_over_rs', 'DM_over_rs', 'DH_over_rs', 'H')
+
+    def __init__(self, z, value, quantity, cov):
+        self.z = np.asarray(z, float)
+        self.value = np.asarray(value, float)
+        self.quantity = np.asarray(quantity)
+        unknown = set(self.quantity.tolist()) - set(self.QUANTITIES)
+        if unknown:
+            raise ValueError(f"unsupported BAO quantities: {sorted(unknown)} (expected one of {self.QUANTITIES})")
+        self.icov = np.linalg.inv(np.atleast_2d(cov))
+
+    @classmethod
+    def desi_dr1(cls, mean=os.path.join(DATA_DIR, 'desi_2024_gaussian_bao_ALL_GCcomb_mean.txt'),
+                 cov=os.path.join(DATA_DIR, 'desi_2024_gaussian_bao_ALL_GCcomb_cov.txt')):
+        z, value, quantity = np.genfromtxt(mean, dtype=None, encoding=None, unpack=True)
+        return cls(z, value, quantity, np.loadtxt(cov))
+
+    def redshifts(self):
+        return self.z
+
+    def chi2(self, bg):
+        rd = bg.rd[:, None]
+        th = np.empty((len(rd), len(self.z)))
+        for q, fn in (('DV_over_rs', lambda: bg.D_V / rd), ('DM_over_rs', lambda: bg.D_M / rd),
+                      ('DH_over_rs', lambda: bg.D_H / rd), ('H', lambda: bg.H)):
+            m = self.quantity == q
+            if m.any():
+                th[:, m] = fn()[:, m]
+        r = th - self.value
+        return np.einsum('bi,ij,bj->b', r, self.icov, r)
+
+class FS8Probe:
+    """Growth-rate measurements f*sigma8(z) with diagonal errors."""
+    name = 'fs8'
+
+    def __init__(self, z, fs8, err):
+        self.z, self.fs8, self.err = np.asarray(z, float), np.asarray(fs8, float), np.asarray(err, float)
+
+    def redshifts(self):
+        return self.z
+
+    def chi2(self, bg):
+        return np.sum(((bg.fs8 - self.fs8) / self.err)**2, axis=1)
+
+class CMBDistancePrior:
+    """
+    Compressed CMB: shift parameter R, acoustic scale l_A and omega_b h^2
+    (Planck 2018 TT,TE,EE+lowE; Chen, Huang & Wang 2019).
+    """
+    name = 'CMB'
+
+    def __init__(self, mean=(1.7502, 301.471, 0.02236), err=(0.0046, 0.090, 0.00015),
+                 corr=((1.0, 0.46, -0.66), (0.46, 1.0, -0.33), (-0.66, -0.33, 1.0))):
+        self.mean = np.asarray(mean)
+        err = np.asarray(err)
+        self.icov = np.linalg.inv(np.asarray(corr) * np.outer(err, err))
+
+    def redshifts(self):
+        return np.array([Z_STAR])
+
+    def chi2(self, bg):
+        D_M = bg.D_M[:, 0]
+        R = np.sqrt(bg.p['Om']) * bg.p['H0'] * D_M / C_KMS
+        l_A = np.pi * D_M / bg.r_s[:, 0]
+        r = np.column_stack([R, l_A, bg.p['ombh2']]) - self.mean
+        return np.einsum('bi,ij,bj->b', r, self.icov, r)
+
+class H0Prior:
+    """Gaussian prior on H0 (default SH0ES, Riess et al. 2022)."""
+    name = 'H0'
+
+    def __init__(self, mean=73.04, err=1.04):
+        self.mean, self.err = mean, err
+
+    def redshifts(self):
+        return np.zeros(0)
+
+    def chi2(self, bg):
+        return ((bg.p['H0'] - self.mean) / self.err)**2
+
+# --- Compositor ---
+class CompositeLikelihood:
+    """
+    Sum of probe chi2 values sharing one Background per parameter batch.
+
+    param_names are the free parameters (in theta order); anything else is
+    taken from `fixed`, then DEFAULTS. The grid is the union of a log-spaced
+    base grid and every probe redshift, built once here, so each probe only
+    pays for its own residuals. Cumulative timings are kept in `timings`.
+    """
+
+    def __init__(self, probes, param_names, fixed=None):
+        self.probes = list(probes)
+        names = [pr.name for pr in self.probes]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate probe names: {names}")
+        reserved = {'total', 'background'} & set(names)
+        if reserved:
+            raise ValueError(f"reserved probe names: {sorted(reserved)}")
+        self.param_names = list(param_names)
+        unknown = set(self.param_names) | set(fixed or {})
+        unknown -= set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown parameters: {sorted(unknown)}")
+        self.fixed = {**DEFAULTS, **(fixed or {})}
+
+        base = np.expm1(np.linspace(0.0, np.log1p(Z_MAX), N_GRID))
+        extra = [np.asarray(pr.redshifts(), float) for pr in self.probes]
+        self.grid = np.unique(np.concatenate([base] + extra))
+        self.index = {pr.name: np.searchsorted(self.grid, z) for pr, z in zip(self.probes, extra)}
+        self.timings = {k: [0.0, 0] for k in ['background'] + names}
+
+    def params(self, thetas):
+        thetas = np.atleast_2d(np.asarray(thetas, dtype=float))
+        B = len(thetas)
+        p = {k: np.full(B, np.nan if v is None else float(v)) for k, v in self.fixed.items()}
+        for i, k in enumerate(self.param_names):
+            p[k] = thetas[:, i]
+        if np.isnan(p['Or']).any():
+            p['Or'] = np.where(np.isnan(p['Or']), OMEGA_R_H2 / (p['H0'] / 100.0)**2, p['Or'])
+        return p
+
+    def _tick(self, key, t0):
+        self.timings[key][0] += time.perf_counter() - t0
+        self.timings[key][1] += 1
+
+    def background(self, thetas):
+        t0 = time.perf_counter()
+        bg = Background(self.grid, self.params(thetas))
+        self._tick('background', t0)
+        return bg
+
+    def breakdown_batch(self, thetas):
+        """Per-probe chi2 arrays, each of shape (B,)."""
+        bg = self.background(thetas)
+        out = {}
+        for pr in self.probes:
+            t0 = time.perf_counter()
+            out[pr.name] = pr.chi2(bg.view(self.index[pr.name]))
+            self._tick(pr.name, t0)
+        return out
+
+    def chi2_batch(self, thetas):
+        parts = self.breakdown_batch(thetas)
+        total = sum(parts.values())
+        return np.where(np.isfinite(total), total, 1e18)
+
+    def __call__(self, theta):
+        return float(self.chi2_batch(theta)[0])
+
+    def breakdown(self, theta):
+        parts = self.breakdown_batch(theta)
+        out = {k: float(v[0]) for k, v in parts.items()}
+        out['total'] = sum(out.values())
+        return out
+
+    def timing_report(self):
+        return {k: {'calls': n, 'total_s': t, 'mean_ms': 1e3 * t / n if n else 0.0}
+                for k, (t, n) in self.timings.items()}
+
+if __name__ == '__main__':
+    like = CompositeLikelihood(
+        [SNProbe.pantheon(), BAOProbe.desi_dr1(), CMBDistancePrior(), H0Prior()],
+        param_names=['A', 'sigma', 'z_peak', 'H0', 'Om', 'w_off'])
+    theta = [0.05, 0.3, 0.7, 68.0, 0.31, -1.0]
+    for k, v in like.breakdown(theta).items():
+        print(f"{k:>6}: chi2 = {v:.3f}")
+    like.chi2_batch(np.tile(theta, (256, 1)))
+    for k, v in like.timing_report().items():
+        print(f"{k:>10}: {v['calls']} calls, {v['mean_ms']:.2f} ms/call")